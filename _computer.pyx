@@ -0,0 +1,142 @@
+# cython: boundscheck=False, wraparound=False, language_level=3
+""" Cython kernel for the Synacor VM dispatch loop.
+
+Build in place with:
+
+    python setup.py build_ext --inplace
+
+computer.Computer.run picks this up automatically when the extension is
+importable. run_batch operates directly on the Computer's mem/regs/stack
+buffers through typed memoryviews and uses the same bail protocol as the
+numba path: it returns to Python for out/in/unknown opcodes and to grow
+the stack.
+"""
+
+def run_batch(unsigned short[::1] mem, unsigned short[::1] regs,
+              unsigned int[::1] stack, Py_ssize_t sp, Py_ssize_t eip,
+              long long max_steps):
+    """Execute up to max_steps non-I/O instructions natively.
+
+    Returns (eip, sp, steps, reason): reason 0 means the step budget ran
+    out (or eip is already -1), 1 means eip points at an instruction
+    Python must execute (out/in/unknown), 2 means the stack array is full.
+    """
+    cdef long long steps = 0
+    cdef int op, a, b, c
+    cdef Py_ssize_t vb, vc
+    while steps < max_steps:
+        if eip == -1:
+            return eip, sp, steps, 0
+        op = mem[eip]
+        # Literal write destinations bail out so Python raises like set_lit
+        # did; unchecked they index regs out of bounds
+        if (op == 1 or op == 3 or op == 4 or op == 5
+                or (9 <= op <= 15)) and mem[eip+1] < 32768:
+            return eip, sp, steps, 1
+        if op == 1: # set
+            b = mem[eip+2]
+            regs[mem[eip+1] - 32768] = regs[b - 32768] if b >= 32768 else b
+            eip += 3
+        elif op == 2: # push
+            if sp == stack.shape[0]:
+                return eip, sp, steps, 2
+            a = mem[eip+1]
+            stack[sp] = regs[a - 32768] if a >= 32768 else a
+            sp += 1
+            eip += 2
+        elif op == 3: # pop
+            if sp == 0: # let Python raise IndexError
+                return eip, sp, steps, 1
+            sp -= 1
+            regs[mem[eip+1] - 32768] = stack[sp]
+            eip += 2
+        elif op == 4: # eq
+            b = mem[eip+2]; c = mem[eip+3]
+            vb = regs[b - 32768] if b >= 32768 else b
+            vc = regs[c - 32768] if c >= 32768 else c
+            regs[mem[eip+1] - 32768] = 1 if vb == vc else 0
+            eip += 4
+        elif op == 5: # gt
+            b = mem[eip+2]; c = mem[eip+3]
+            vb = regs[b - 32768] if b >= 32768 else b
+            vc = regs[c - 32768] if c >= 32768 else c
+            regs[mem[eip+1] - 32768] = 1 if vb > vc else 0
+            eip += 4
+        elif op == 6: # jmp
+            a = mem[eip+1]
+            eip = regs[a - 32768] if a >= 32768 else a
+        elif op == 7: # jt
+            a = mem[eip+1]
+            if (regs[a - 32768] if a >= 32768 else a):
+                b = mem[eip+2]
+                eip = regs[b - 32768] if b >= 32768 else b
+            else:
+                eip += 3
+        elif op == 8: # jf
+            a = mem[eip+1]
+            if not (regs[a - 32768] if a >= 32768 else a):
+                b = mem[eip+2]
+                eip = regs[b - 32768] if b >= 32768 else b
+            else:
+                eip += 3
+        elif op == 9: # add
+            b = mem[eip+2]; c = mem[eip+3]
+            regs[mem[eip+1] - 32768] = (((regs[b - 32768] if b >= 32768 else b)
+                                         + (regs[c - 32768] if c >= 32768 else c)) & 32767)
+            eip += 4
+        elif op == 10: # mult
+            b = mem[eip+2]; c = mem[eip+3]
+            regs[mem[eip+1] - 32768] = (((regs[b - 32768] if b >= 32768 else b)
+                                         * (regs[c - 32768] if c >= 32768 else c)) & 32767)
+            eip += 4
+        elif op == 11: # mod
+            b = mem[eip+2]; c = mem[eip+3]
+            vb = regs[b - 32768] if b >= 32768 else b
+            vc = regs[c - 32768] if c >= 32768 else c
+            if vc == 0: # let Python raise ZeroDivisionError
+                return eip, sp, steps, 1
+            regs[mem[eip+1] - 32768] = (vb % vc) & 32767
+            eip += 4
+        elif op == 12: # and
+            b = mem[eip+2]; c = mem[eip+3]
+            regs[mem[eip+1] - 32768] = ((regs[b - 32768] if b >= 32768 else b)
+                                        & (regs[c - 32768] if c >= 32768 else c))
+            eip += 4
+        elif op == 13: # or
+            b = mem[eip+2]; c = mem[eip+3]
+            regs[mem[eip+1] - 32768] = ((regs[b - 32768] if b >= 32768 else b)
+                                        | (regs[c - 32768] if c >= 32768 else c))
+            eip += 4
+        elif op == 14: # not
+            b = mem[eip+2]
+            regs[mem[eip+1] - 32768] = (~(regs[b - 32768] if b >= 32768 else b)) & 32767
+            eip += 3
+        elif op == 15: # rmem
+            b = mem[eip+2]
+            regs[mem[eip+1] - 32768] = mem[regs[b - 32768] if b >= 32768 else b]
+            eip += 3
+        elif op == 16: # wmem
+            a = mem[eip+1]; b = mem[eip+2]
+            mem[regs[a - 32768] if a >= 32768 else a] = regs[b - 32768] if b >= 32768 else b
+            eip += 3
+        elif op == 17: # call
+            if sp == stack.shape[0]:
+                return eip, sp, steps, 2
+            a = mem[eip+1]
+            stack[sp] = eip + 2
+            sp += 1
+            eip = regs[a - 32768] if a >= 32768 else a
+        elif op == 18: # ret
+            if sp == 0:
+                eip = -1
+            else:
+                sp -= 1
+                eip = stack[sp]
+        elif op == 21: # noop
+            eip += 1
+        elif op == 0: # halt
+            eip = -1
+        else: # out/in/unknown: execute in Python
+            return eip, sp, steps, 1
+        steps += 1
+    return eip, sp, steps, 0
@@ -1,30 +1,173 @@
-import sys
-import itertools
+""" Synacor challenge VM.
+
+Pure Python with no hard dependencies. The hot loop in Computer.run is
+written to be friendly to PyPy's tracing JIT (dispatch over locals, no
+per-step method binding or MethodType allocation), so for long CPU-bound
+runs like the teleporter check, prefer:
+
+    pypy3 computer.py challenge.bin < input.txt
 
-from types import MethodType
+CPython works identically, just slower; building the Cython kernel
+(python setup.py build_ext --inplace) or installing numba compiles the
+non-I/O part of the loop instead.
+"""
+
+import sys
+import array
 
 def eprint(*args, **kwargs):
     print(*args, file=sys.stderr, flush=True, **kwargs)
 
-class FunctionArray(list):
-    def __get__(self, instance, owner):
-        return self.MethodView(self, instance) if instance else self
-
-    class MethodView(list):
-        def __init__(self, base, instance):
-            self.base = base
-            self.instance = instance
-        def __len__(self):
-            return len(self.base)
-        def __getitem__(self, i):
-            return MethodType(self.base[i], self.instance)
-        def __str__(self):
-            return f'<bound list of {self.base.__str__()}>'
-        def __repr__(self):
-            return f'<bound list of {self.base.__repr__()}>'
+# Indexing a prebuilt table is cheaper than a chr() call per output char
+_CHR = [chr(i) for i in range(256)]
+
+# Optional native fast path: with numba installed, the non-I/O part of the
+# dispatch loop runs as LLVM-compiled code over uint16 views of mem/regs and
+# only bails back to Python for out/in (and to grow the stack).
+try:
+    import numpy as _np
+    from numba import njit as _njit
+except ImportError:
+    _np = None
+    _njit = None
+
+# Optional compiled kernel (see _computer.pyx); preferred over numba when
+# built since it works on the live buffers with no copies or warmup.
+try:
+    from _computer import run_batch as _c_run_batch
+except ImportError:
+    _c_run_batch = None
+
+if _njit is not None:
+    @_njit(cache=True)
+    def _run_batch(mem, regs, stack, sp, eip, max_steps):
+        """Execute up to max_steps non-I/O instructions natively.
+
+        Returns (eip, sp, steps, reason): reason 0 means the step budget ran
+        out (or eip is already -1), 1 means eip points at an instruction
+        Python must execute (out/in/unknown), 2 means the stack array is full.
+        """
+        steps = 0
+        while steps < max_steps:
+            if eip == -1:
+                return eip, sp, steps, 0
+            op = mem[eip]
+            # Literal write destinations bail out so Python raises like
+            # set_lit did; unchecked they index regs out of bounds
+            if (op == 1 or op == 3 or op == 4 or op == 5
+                    or (9 <= op <= 15)) and mem[eip+1] < 32768:
+                return eip, sp, steps, 1
+            if op == 1: # set
+                b = mem[eip+2]
+                regs[mem[eip+1] - 32768] = regs[b - 32768] if b >= 32768 else b
+                eip += 3
+            elif op == 2: # push
+                if sp == stack.shape[0]:
+                    return eip, sp, steps, 2
+                a = mem[eip+1]
+                stack[sp] = regs[a - 32768] if a >= 32768 else a
+                sp += 1
+                eip += 2
+            elif op == 3: # pop
+                if sp == 0: # let Python raise IndexError
+                    return eip, sp, steps, 1
+                sp -= 1
+                regs[mem[eip+1] - 32768] = stack[sp]
+                eip += 2
+            elif op == 4: # eq
+                b = mem[eip+2]; c = mem[eip+3]
+                vb = regs[b - 32768] if b >= 32768 else b
+                vc = regs[c - 32768] if c >= 32768 else c
+                regs[mem[eip+1] - 32768] = 1 if vb == vc else 0
+                eip += 4
+            elif op == 5: # gt
+                b = mem[eip+2]; c = mem[eip+3]
+                vb = regs[b - 32768] if b >= 32768 else b
+                vc = regs[c - 32768] if c >= 32768 else c
+                regs[mem[eip+1] - 32768] = 1 if vb > vc else 0
+                eip += 4
+            elif op == 6: # jmp
+                a = mem[eip+1]
+                eip = regs[a - 32768] if a >= 32768 else a
+            elif op == 7: # jt
+                a = mem[eip+1]
+                if (regs[a - 32768] if a >= 32768 else a):
+                    b = mem[eip+2]
+                    eip = regs[b - 32768] if b >= 32768 else b
+                else:
+                    eip += 3
+            elif op == 8: # jf
+                a = mem[eip+1]
+                if not (regs[a - 32768] if a >= 32768 else a):
+                    b = mem[eip+2]
+                    eip = regs[b - 32768] if b >= 32768 else b
+                else:
+                    eip += 3
+            elif op == 9: # add
+                b = mem[eip+2]; c = mem[eip+3]
+                regs[mem[eip+1] - 32768] = ((regs[b - 32768] if b >= 32768 else b)
+                                            + (regs[c - 32768] if c >= 32768 else c)) & 32767
+                eip += 4
+            elif op == 10: # mult
+                b = mem[eip+2]; c = mem[eip+3]
+                regs[mem[eip+1] - 32768] = ((regs[b - 32768] if b >= 32768 else b)
+                                            * (regs[c - 32768] if c >= 32768 else c)) & 32767
+                eip += 4
+            elif op == 11: # mod
+                b = mem[eip+2]; c = mem[eip+3]
+                vb = regs[b - 32768] if b >= 32768 else b
+                vc = regs[c - 32768] if c >= 32768 else c
+                if vc == 0: # let Python raise ZeroDivisionError
+                    return eip, sp, steps, 1
+                regs[mem[eip+1] - 32768] = (vb % vc) & 32767
+                eip += 4
+            elif op == 12: # and
+                b = mem[eip+2]; c = mem[eip+3]
+                regs[mem[eip+1] - 32768] = ((regs[b - 32768] if b >= 32768 else b)
+                                            & (regs[c - 32768] if c >= 32768 else c))
+                eip += 4
+            elif op == 13: # or
+                b = mem[eip+2]; c = mem[eip+3]
+                regs[mem[eip+1] - 32768] = ((regs[b - 32768] if b >= 32768 else b)
+                                            | (regs[c - 32768] if c >= 32768 else c))
+                eip += 4
+            elif op == 14: # not
+                b = mem[eip+2]
+                regs[mem[eip+1] - 32768] = ~(regs[b - 32768] if b >= 32768 else b) & 32767
+                eip += 3
+            elif op == 15: # rmem
+                b = mem[eip+2]
+                regs[mem[eip+1] - 32768] = mem[regs[b - 32768] if b >= 32768 else b]
+                eip += 3
+            elif op == 16: # wmem
+                a = mem[eip+1]; b = mem[eip+2]
+                mem[regs[a - 32768] if a >= 32768 else a] = regs[b - 32768] if b >= 32768 else b
+                eip += 3
+            elif op == 17: # call
+                if sp == stack.shape[0]:
+                    return eip, sp, steps, 2
+                a = mem[eip+1]
+                stack[sp] = eip + 2
+                sp += 1
+                eip = regs[a - 32768] if a >= 32768 else a
+            elif op == 18: # ret
+                if sp == 0:
+                    eip = -1
+                else:
+                    sp -= 1
+                    eip = stack[sp]
+            elif op == 21: # noop
+                eip += 1
+            elif op == 0: # halt
+                eip = -1
+            else: # out/in/unknown: execute in Python
+                return eip, sp, steps, 1
+            steps += 1
+        return eip, sp, steps, 0
 
 class Computer:
-    __slots__ = ('num_steps', 'eip', 'regs', 'stack', 'mem', 'istream', 'cur_line', 'ostream', 'debug')
+    __slots__ = ('num_steps', 'eip', 'regs', 'mem', 'istream', 'cur_line', 'ostream', 'debug',
+                 '_dispatch', '_nargs', '_icache', '_lit', '_out_buf', '_in_pos', '_stk', '_sp')
     MOD = 1 << 15
     MSK = MOD-1
     R0 = MOD + 0
@@ -36,21 +179,55 @@ class Computer:
     R6 = MOD + 6
     R7 = MOD + 7
 
+    # (name, nargs) indexed by opcode; handlers are the op_<name> methods.
+    OPS = (
+        ('halt', 0), ( 'set', 2), ('push', 1), ( 'pop', 1),
+        (  'eq', 3), (  'gt', 3), ( 'jmp', 1), (  'jt', 2),
+        (  'jf', 2), ( 'add', 3), ('mult', 3), ( 'mod', 3),
+        ( 'and', 3), (  'or', 3), ( 'not', 2), ('rmem', 2),
+        ('wmem', 2), ('call', 1), ( 'ret', 0), ( 'out', 1),
+        (  'in', 1), ('noop', 0),
+    )
+
+    # Opcodes whose first operand is a register destination (set_lit in the
+    # baseline); every other operand is a read.
+    _REG_DEST_OPS = frozenset((1, 3, 4, 5, 9, 10, 11, 12, 13, 14, 15, 20))
+
     def __init__(self, istream=sys.stdin, ostream=sys.stdout):
+        self._dispatch = tuple(getattr(self, 'op_' + name) for name, _ in self.OPS)
+        self._nargs = bytes(nargs for _, nargs in self.OPS)
+        self._icache = [None] * self.MOD
+        self._lit = list(range(self.MOD)) + [0] * 8
+        self._out_buf = []
+        self._in_pos = 0
         self.num_steps = 0
         self.eip = 0
-        self.regs = [0] * 8
-        self.stack = []
-        self.mem = [0] * self.MOD
+        # Flat native uint16 buffers instead of lists of boxed ints: 64KB for
+        # mem instead of ~32k PyLongs, and stores are range-checked for free.
+        # bytes(n) zero-fill avoids materializing a [0]*n list just to throw
+        # it away after the array copies it
+        self.regs = array.array('H', bytes(2 * 8))
+        # Preallocated stack with a manual cursor; 'I' since call pushes eip
+        self._stk = array.array('I', bytes(4 * (1 << 16)))
+        self._sp = 0
+        self.mem = array.array('H', bytes(2 * self.MOD))
         self.cur_line = None
         self.istream = istream
         self.ostream = ostream
         self.debug = False
     
+    @property
+    def stack(self):
+        """ The live stack contents (as a copy; push/pop use _stk/_sp) """
+        return self._stk[:self._sp].tolist()
+
     def debug_print(self, *args, **kwargs):
         if self.debug:
             eprint(f'Step {self.num_steps}:', *args, **kwargs)
 
+    # get_lit/set_lit are kept for interactive poking around; the op_*
+    # methods inline the decode (literal if < MOD, else register) to avoid
+    # two extra Python calls per operand on the hot path.
     def get_lit(self, literal):
         if literal < self.MOD:
             return literal
@@ -77,112 +254,129 @@ class Computer:
             with open(f, 'rb') as g:
                 self.load(g)
                 return
-        mem = f.read(self.MOD * 2)
-        for ind, (i,j) in enumerate(zip(mem[0::2], mem[1::2])):
-            v = (j << 8) | i
-            self.mem[ind] = v
+        data = f.read(self.MOD * 2)
+        # One bulk memcpy instead of 32k Python-level shift/or iterations;
+        # the image is little-endian u16, so only big-endian hosts swap.
+        mem = array.array('H', data.ljust(self.MOD * 2, b'\x00'))
+        if sys.byteorder == 'big':
+            mem.byteswap()
+        self.mem = mem
 
     def op_halt(self):
         return -1
     def op_set(self, a, b):
-        self.set_lit(a, self.get_lit(b))
+        r = self.regs
+        r[a - 32768] = r[b - 32768] if b >= 32768 else b
     def op_push(self, a):
-        self.stack.append(self.get_lit(a))
+        sp = self._sp
+        if sp == len(self._stk):
+            self._stk.extend(self._stk)
+        self._stk[sp] = self.regs[a - 32768] if a >= 32768 else a
+        self._sp = sp + 1
     def op_pop(self, a):
-        self.set_lit(a, self.stack.pop())
+        if self._sp == 0:
+            raise IndexError('pop from empty stack')
+        self._sp = sp = self._sp - 1
+        self.regs[a - 32768] = self._stk[sp]
     def op_eq(self, a, b, c):
-        self.set_lit(a, 1 if self.get_lit(b) == self.get_lit(c) else 0)
+        r = self.regs
+        vb = r[b - 32768] if b >= 32768 else b
+        vc = r[c - 32768] if c >= 32768 else c
+        r[a - 32768] = 1 if vb == vc else 0
     def op_gt(self, a, b, c):
-        self.set_lit(a, 1 if self.get_lit(b) > self.get_lit(c) else 0)
+        r = self.regs
+        vb = r[b - 32768] if b >= 32768 else b
+        vc = r[c - 32768] if c >= 32768 else c
+        r[a - 32768] = 1 if vb > vc else 0
     def op_jmp(self, a):
-        return self.get_lit(a)
+        return self.regs[a - 32768] if a >= 32768 else a
     def op_jt(self, a, b):
-        if self.get_lit(a):
-            return self.get_lit(b)
+        r = self.regs
+        if (r[a - 32768] if a >= 32768 else a):
+            return r[b - 32768] if b >= 32768 else b
     def op_jf(self, a, b):
-        if not self.get_lit(a):
-            return self.get_lit(b)
+        r = self.regs
+        if not (r[a - 32768] if a >= 32768 else a):
+            return r[b - 32768] if b >= 32768 else b
     def op_add(self, a, b, c):
-        self.set_lit(a, (self.get_lit(b) + self.get_lit(c)) & self.MSK)
+        r = self.regs
+        r[a - 32768] = ((r[b - 32768] if b >= 32768 else b)
+                        + (r[c - 32768] if c >= 32768 else c)) & 32767
     def op_mult(self, a, b, c):
-        self.set_lit(a, (self.get_lit(b) * self.get_lit(c)) & self.MSK)
+        r = self.regs
+        r[a - 32768] = ((r[b - 32768] if b >= 32768 else b)
+                        * (r[c - 32768] if c >= 32768 else c)) & 32767
     def op_mod(self, a, b, c):
-        self.set_lit(a, (self.get_lit(b) % self.get_lit(c)) & self.MSK)
+        r = self.regs
+        r[a - 32768] = ((r[b - 32768] if b >= 32768 else b)
+                        % (r[c - 32768] if c >= 32768 else c)) & 32767
     def op_and(self, a, b, c):
-        self.set_lit(a, (self.get_lit(b) & self.get_lit(c)) & self.MSK)
+        r = self.regs
+        r[a - 32768] = ((r[b - 32768] if b >= 32768 else b)
+                        & (r[c - 32768] if c >= 32768 else c))
     def op_or(self, a, b, c):
-        self.set_lit(a, (self.get_lit(b) | self.get_lit(c)) & self.MSK)
+        r = self.regs
+        r[a - 32768] = ((r[b - 32768] if b >= 32768 else b)
+                        | (r[c - 32768] if c >= 32768 else c))
     def op_not(self, a, b):
-        self.set_lit(a, (~self.get_lit(b)) & self.MSK)
+        r = self.regs
+        r[a - 32768] = ~(r[b - 32768] if b >= 32768 else b) & 32767
     def op_rmem(self, a, b):
-        self.set_lit(a, self.mem[self.get_lit(b)])
+        self.regs[a - 32768] = self.mem[self.regs[b - 32768] if b >= 32768 else b]
     def op_wmem(self, a, b):
-        self.mem[self.get_lit(a)] = self.get_lit(b)
+        r = self.regs
+        self.mem[r[a - 32768] if a >= 32768 else a] = r[b - 32768] if b >= 32768 else b
     def op_call(self, a):
-        self.stack.append(self.eip)
-        return self.get_lit(a)
+        sp = self._sp
+        if sp == len(self._stk):
+            self._stk.extend(self._stk)
+        self._stk[sp] = self.eip
+        self._sp = sp + 1
+        return self.regs[a - 32768] if a >= 32768 else a
     def op_ret(self):
-        if not self.stack:
+        if self._sp == 0:
             return -1
-        return self.stack.pop()
+        self._sp = sp = self._sp - 1
+        return self._stk[sp]
+    def _flush_out(self):
+        if self._out_buf:
+            self.ostream.write(''.join(self._out_buf))
+            self._out_buf.clear()
+            self.ostream.flush()
+
     def op_out(self, a):
-        c = chr(self.get_lit(a))
-        self.ostream.write(c)
+        # Buffer per-line: one ostream.write per line instead of per char
+        v = self.regs[a - 32768] if a >= 32768 else a
+        c = _CHR[v] if v < 256 else chr(v)
+        self._out_buf.append(c)
         if c == '\n':
-            self.ostream.flush()
+            self._flush_out()
             self.debug_print(f'Output flushed')
     def op_in(self, a):
+        self._flush_out()
         if not self.cur_line:
             eprint(f'Step {self.num_steps}: Input')
             if self.istream is sys.stdin:
-                self.cur_line = input() + '\n'
+                line = input() + '\n'
             else:
-                self.cur_line = self.istream.readline()
-            if not self.cur_line:
+                line = self.istream.readline()
+            if not line:
                 raise RuntimeError('Hit EOF!')
-            eprint('>>> '+self.cur_line[:-1]) # Strip the '\n'
-        self.set_lit(a, ord(self.cur_line[0]))
-        self.cur_line = self.cur_line[1:]
+            if isinstance(line, str):
+                # Hold the line as bytes: indexing yields ints, no ord() call
+                line = line.encode()
+            eprint('>>> '+line[:-1].decode()) # Strip the '\n'
+            self.cur_line = line
+            self._in_pos = 0
+        # Advance a cursor instead of re-slicing the line per character
+        self.regs[a - 32768] = self.cur_line[self._in_pos]
+        self._in_pos += 1
+        if self._in_pos >= len(self.cur_line):
+            self.cur_line = None
+            self._in_pos = 0
     def op_noop(self):
         pass
 
-    class Op:
-        __slots__ = ('opcode', 'name', 'nargs', 'fn')
-        def __init__(self, opcode, fn, nargs):
-            self.opcode = opcode
-            self.name = fn.__name__
-            self.nargs = nargs
-            self.fn = fn
-        def __call__(self, instance, *args, **kwargs):
-            return self.fn(instance, *args, **kwargs)
-        def __get__(self, instance, owner):
-            return MethodType(self, instance) if instance else self
-
-    ops = FunctionArray([
-        Op( 0, op_halt, 0),
-        Op( 1,  op_set, 2),
-        Op( 2, op_push, 1),
-        Op( 3,  op_pop, 1),
-        Op( 4,   op_eq, 3),
-        Op( 5,   op_gt, 3),
-        Op( 6,  op_jmp, 1),
-        Op( 7,   op_jt, 2),
-        Op( 8,   op_jf, 2),
-        Op( 9,  op_add, 3),
-        Op(10, op_mult, 3),
-        Op(11,  op_mod, 3),
-        Op(12,  op_and, 3),
-        Op(13,   op_or, 3),
-        Op(14,  op_not, 2),
-        Op(15, op_rmem, 2),
-        Op(16, op_wmem, 2),
-        Op(17, op_call, 1),
-        Op(18,  op_ret, 0),
-        Op(19,  op_out, 1),
-        Op(20,   op_in, 1),
-        Op(21, op_noop, 0),
-    ])
-    
     def parse_text(self, start_pos=None, num_bytes=40):
         if start_pos is None:
             start_pos = self.eip
@@ -193,13 +387,13 @@ class Computer:
             loc = cur_pos
             i = self.mem[cur_pos]
             cur_pos += 1
-            if not 0 <= i < len(self.ops):
+            if not 0 <= i < len(self.OPS):
                 print(f'{loc}: ILLOP {i}')
                 continue
-            op = self.ops[i]
-            s = f'{loc}: {op.name}'
+            name, nargs = self.OPS[i]
+            s = f'{loc}: op_{name}'
             try:
-                for _ in range(op.nargs):
+                for _ in range(nargs):
                     arg = self.mem[cur_pos]
                     cur_pos += 1
                     if arg < self.MOD:
@@ -216,20 +410,33 @@ class Computer:
             print(s)
 
     def step(self):
-        if self.eip == -1:
+        # Cache the slot attributes in locals, like the run() ladder does
+        cur_eip = self.eip
+        if cur_eip == -1:
             raise RuntimeError('Computer halted')
 
-        cur_eip = self.eip
+        mem = self.mem
+        dispatch = self._dispatch
+
+        opcode = mem[cur_eip]
+        nargs = self._nargs[opcode]
+        self.eip = cur_eip + 1 + nargs
 
-        opcode = self.mem[self.eip]
-        self.eip += 1
+        # The op_* handlers index regs[a - 32768] directly, so catch literal
+        # write destinations here like the baseline's set_lit did
+        if opcode in self._REG_DEST_OPS and mem[cur_eip + 1] < 32768:
+            raise RuntimeError('Cannot set a numeric literal')
 
-        op = self.ops[opcode]
-        
-        args = self.mem[self.eip:self.eip + op.nargs]
-        self.eip += op.nargs
-        
-        neip = op(*args)
+        # Pass arguments directly at fixed arity instead of building a slice
+        # and unpacking it through *args.
+        if nargs == 0:
+            neip = dispatch[opcode]()
+        elif nargs == 1:
+            neip = dispatch[opcode](mem[cur_eip + 1])
+        elif nargs == 2:
+            neip = dispatch[opcode](mem[cur_eip + 1], mem[cur_eip + 2])
+        else:
+            neip = dispatch[opcode](mem[cur_eip + 1], mem[cur_eip + 2], mem[cur_eip + 3])
         if neip is not None:
             self.eip = neip
 
@@ -242,5 +449,310 @@ class Computer:
             self.ostream = ostream
         if max_step is not None:
             num_steps = max_step - self.num_steps
-        for _ in (itertools.count() if num_steps is None else range(num_steps)):
-            self.step()
\ No newline at end of file
+        if self.debug:
+            return self._run_debug(num_steps)
+        if _c_run_batch is not None:
+            return self._run_cython(num_steps)
+        if _njit is not None:
+            return self._run_native(num_steps)
+        # step() inlined into one big dispatch ladder over locals: per-instruction
+        # attribute loads and method calls are the dominant cost in CPython.
+        mem = self.mem
+        regs = self.regs
+        stk = self._stk
+        sp = self._sp
+        nargs_tab = self._nargs
+        reg_dest = self._REG_DEST_OPS
+        # Decoded-instruction cache: eip -> (op, a, b, c, next_eip). wmem
+        # invalidates the slots it can affect; the cache is rebuilt on every
+        # run() entry since the notebooks poke mem directly between runs.
+        icache = self._icache = [None] * self.MOD
+        # Shadow literal table: lit[x] is x itself for x < MOD and the live
+        # register value for MOD <= x < MOD+8, so operand reads are one index
+        # with no literal-vs-register branch. Inside the loop the ladder reads
+        # AND writes only lit (one store per write, no index arithmetic); the
+        # real regs array is synced from the mirror around I/O calls and on
+        # exit, and resynced here in case it was poked between runs.
+        lit = self._lit
+        lit[self.MOD:] = regs
+        eip = self.eip
+        base_steps = self.num_steps
+        steps = 0
+        # Counter-based driver so fused pairs below can consume two steps
+        # without overshooting an exact num_steps bound; -1 means unbounded.
+        limit = -1 if num_steps is None else max(num_steps, 0)
+        try:
+            while steps != limit:
+                if eip == -1:
+                    raise RuntimeError('Computer halted')
+                entry = icache[eip]
+                if entry is None:
+                    op = mem[eip]
+                    n = nargs_tab[op] # bad opcodes IndexError, like step()
+                    a = mem[eip+1] if n >= 1 else 0
+                    b = mem[eip+2] if n >= 2 else 0
+                    c = mem[eip+3] if n >= 3 else 0
+                    # Validate write destinations once at decode (free per
+                    # execution): a literal dest would silently poison the
+                    # lit identity table instead of erroring like baseline
+                    if a < 32768 and op in reg_dest:
+                        raise RuntimeError('Cannot set a numeric literal')
+                    nxt = eip + 1 + n
+                    # Fuse eq/gt into the jt/jf that tests the same register
+                    # with a literal target: ops 22-25, one dispatch for the
+                    # pair. The entry's last slot packs (target, fallthrough).
+                    if (op == 4 or op == 5) and a >= 32768 and nxt + 2 < 32768:
+                        nop = mem[nxt]
+                        if (nop == 7 or nop == 8) and mem[nxt+1] == a and mem[nxt+2] < 32768:
+                            entry = (18 + op + (nop - 7) * 2, a, b, c,
+                                     (mem[nxt+2], nxt + 3))
+                    if entry is None:
+                        entry = (op, a, b, c, nxt)
+                    icache[eip] = entry
+                op, a, b, c, eip = entry
+                # Ladder ordered by measured frequency over the scripted
+                # teleporter run (868k steps): push/pop ~16% each, then
+                # and/call/ret/add/or/not/rmem; mod, noop, halt are rare.
+                if op == 2: # push
+                    if sp == len(stk):
+                        stk.extend(stk)
+                    stk[sp] = lit[a]
+                    sp += 1
+                elif op == 3: # pop
+                    if sp == 0:
+                        raise IndexError('pop from empty stack')
+                    sp -= 1
+                    lit[a] = stk[sp]
+                elif op == 12: # and
+                    lit[a] = lit[b] & lit[c]
+                elif op == 17: # call
+                    if sp == len(stk):
+                        stk.extend(stk)
+                    stk[sp] = eip
+                    sp += 1
+                    eip = lit[a]
+                elif op == 18: # ret
+                    if sp:
+                        sp -= 1
+                        eip = stk[sp]
+                    else:
+                        eip = -1
+                elif op == 9: # add
+                    lit[a] = (lit[b] + lit[c]) & 32767
+                elif op == 13: # or
+                    lit[a] = lit[b] | lit[c]
+                elif op == 14: # not
+                    lit[a] = ~lit[b] & 32767
+                elif op == 15: # rmem
+                    lit[a] = mem[lit[b]]
+                elif op == 1: # set
+                    lit[a] = lit[b]
+                elif op == 24: # fused eq + jf
+                    v = 1 if lit[b] == lit[c] else 0
+                    lit[a] = v
+                    t, neip = eip
+                    if limit < 0 or steps + 2 <= limit:
+                        steps += 1
+                        eip = neip if v else t
+                    else: # only the compare fits in the step budget
+                        eip = neip - 3
+                elif op == 22: # fused eq + jt
+                    v = 1 if lit[b] == lit[c] else 0
+                    lit[a] = v
+                    t, neip = eip
+                    if limit < 0 or steps + 2 <= limit:
+                        steps += 1
+                        eip = t if v else neip
+                    else:
+                        eip = neip - 3
+                elif op == 25: # fused gt + jf
+                    v = 1 if lit[b] > lit[c] else 0
+                    lit[a] = v
+                    t, neip = eip
+                    if limit < 0 or steps + 2 <= limit:
+                        steps += 1
+                        eip = neip if v else t
+                    else:
+                        eip = neip - 3
+                elif op == 23: # fused gt + jt
+                    v = 1 if lit[b] > lit[c] else 0
+                    lit[a] = v
+                    t, neip = eip
+                    if limit < 0 or steps + 2 <= limit:
+                        steps += 1
+                        eip = t if v else neip
+                    else:
+                        eip = neip - 3
+                elif op == 8: # jf
+                    if not lit[a]:
+                        eip = lit[b]
+                elif op == 4: # eq
+                    lit[a] = 1 if lit[b] == lit[c] else 0
+                elif op == 16: # wmem
+                    addr = lit[a]
+                    mem[addr] = lit[b]
+                    # Drop any decoded instruction that read this word (a
+                    # fused pair can reach back up to 6 words)
+                    for i in range(addr - 6 if addr >= 6 else 0, addr + 1):
+                        icache[i] = None
+                elif op == 10: # mult
+                    lit[a] = (lit[b] * lit[c]) & 32767
+                elif op == 7: # jt
+                    if lit[a]:
+                        eip = lit[b]
+                elif op == 5: # gt
+                    lit[a] = 1 if lit[b] > lit[c] else 0
+                elif op == 19: # out
+                    self.eip = eip
+                    self.num_steps = base_steps + steps
+                    regs[:] = array.array('H', lit[32768:])
+                    self.op_out(a)
+                elif op == 6: # jmp
+                    eip = lit[a]
+                elif op == 20: # in
+                    self.eip = eip
+                    self.num_steps = base_steps + steps
+                    regs[:] = array.array('H', lit[32768:])
+                    self.op_in(a)
+                    lit[a] = regs[a - 32768]
+                elif op == 11: # mod
+                    lit[a] = (lit[b] % lit[c]) & 32767
+                elif op == 21: # noop
+                    pass
+                else: # halt
+                    eip = -1
+                steps += 1
+        finally:
+            self.eip = eip
+            self.num_steps = base_steps + steps
+            self._sp = sp
+            # Write the shadow register mirror back to the real register file
+            regs[:] = array.array('H', lit[32768:])
+            self._flush_out()
+
+    def _run_debug(self, num_steps):
+        # One step() per instruction, re-creating the baseline R7 watchpoint
+        # that used to live in get_lit/set_lit (inlined out of the op_*
+        # handlers since): report reads of R7 operands before the step and
+        # writes to R7 after it. The fast ladder carries no debug checks.
+        limit = -1 if num_steps is None else max(num_steps, 0)
+        steps = 0
+        R7 = self.R7
+        try:
+            while steps != limit:
+                eip = self.eip
+                sets_r7 = False
+                if eip != -1 and self.mem[eip] < len(self.OPS):
+                    op = self.mem[eip]
+                    n = self._nargs[op]
+                    args = self.mem[eip + 1:eip + 1 + n]
+                    if op in self._REG_DEST_OPS:
+                        srcs = args[1:]
+                        sets_r7 = n >= 1 and args[0] == R7
+                    elif op == 7 or op == 8: # jt/jf read the target lazily
+                        a = args[0]
+                        va = self.regs[a - 32768] if a >= 32768 else a
+                        taken = va != 0 if op == 7 else va == 0
+                        srcs = args if taken else args[:1]
+                    else:
+                        srcs = args
+                    for s in srcs:
+                        if s == R7:
+                            self.debug_print(f"Getting R7 = {self.regs[7]}")
+                num = self.num_steps
+                self.step()
+                if sets_r7:
+                    eprint(f'Step {num}: Setting R7 = {self.regs[7]}')
+                steps += 1
+        finally:
+            self._flush_out()
+
+    def _run_cython(self, num_steps):
+        """Drive the compiled kernel, re-entering after I/O bails and stack
+        growth. Unlike _run_native it works on the live buffers directly."""
+        eip = self.eip
+        sp = self._sp
+        base_steps = self.num_steps
+        done = 0
+        try:
+            while True:
+                budget = (1 << 62) if num_steps is None else num_steps - done
+                eip, sp, steps, reason = _c_run_batch(self.mem, self.regs, self._stk,
+                                                      sp, eip, budget)
+                done += steps
+                if reason == 2: # stack array full; double it
+                    self._stk.extend(self._stk)
+                elif reason == 1: # out/in/error/unknown: one instruction in Python
+                    self.eip = eip
+                    self.num_steps = base_steps + done
+                    self._sp = sp
+                    try:
+                        self.step()
+                    finally:
+                        eip = self.eip
+                        done = self.num_steps - base_steps
+                        sp = self._sp
+                else:
+                    if num_steps is not None and done >= num_steps:
+                        break
+                    if eip == -1:
+                        raise RuntimeError('Computer halted')
+        finally:
+            self.eip = eip
+            self.num_steps = base_steps + done
+            self._sp = sp
+            self._flush_out()
+
+    def _run_native(self, num_steps):
+        """Drive _run_batch, re-entering after I/O bails and stack growth."""
+        mem = _np.frombuffer(self.mem, dtype=_np.uint16)
+        regs = _np.frombuffer(self.regs, dtype=_np.uint16)
+        sp = self._sp
+        cap = max(1 << 16, 2 * sp)
+        stack = _np.empty(cap, dtype=_np.int64)
+        stack[:sp] = self._stk[:sp]
+        eip = self.eip
+        base_steps = self.num_steps
+        done = 0
+        try:
+            while True:
+                budget = (1 << 62) if num_steps is None else num_steps - done
+                eip, sp, steps, reason = _run_batch(mem, regs, stack, sp, eip, budget)
+                done += steps
+                if reason == 2: # stack array full; double it
+                    grown = _np.empty(2 * stack.shape[0], dtype=_np.int64)
+                    grown[:sp] = stack[:sp]
+                    stack = grown
+                elif reason == 1: # out/in/unknown: one instruction in Python
+                    self.eip = eip
+                    self.num_steps = base_steps + done
+                    try:
+                        self.step()
+                    finally:
+                        eip = self.eip
+                        done = self.num_steps - base_steps
+                else:
+                    if num_steps is not None and done >= num_steps:
+                        break
+                    if eip == -1:
+                        raise RuntimeError('Computer halted')
+        finally:
+            self.eip = eip
+            self.num_steps = base_steps + done
+            while len(self._stk) < sp:
+                self._stk.extend(self._stk)
+            self._stk[:sp] = array.array('I', stack[:sp])
+            self._sp = sp
+            self._flush_out()
+
+
+if __name__ == '__main__':
+    computer = Computer()
+    computer.load(sys.argv[1] if len(sys.argv) > 1 else 'challenge.bin')
+    try:
+        computer.run()
+    except EOFError: # out of stdin
+        pass
+    except RuntimeError as e:
+        if str(e) != 'Computer halted':
+            raise
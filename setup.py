@@ -0,0 +1,9 @@
+""" Builds the optional Cython kernel: python setup.py build_ext --inplace """
+
+from setuptools import setup
+from Cython.Build import cythonize
+
+setup(
+    name='synacor-computer',
+    ext_modules=cythonize('_computer.pyx'),
+)